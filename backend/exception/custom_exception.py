@@ -1,5 +1,6 @@
 import sys
 import traceback
+from functools import cached_property
 
 from logger.custom_logger import CustomLogger
 logger=CustomLogger().get_logger(__file__)
@@ -14,18 +15,24 @@ class DocumentPortalException(Exception):
         if error_details is None:
             error_details = sys
         
-        # Get exception info
-        exc_type, exc_value, exc_tb = error_details.exc_info()
+        # Get exception info; the traceback is only formatted if someone reads it
+        self._exc_info = error_details.exc_info()
+        exc_tb = self._exc_info[2]
         
         if exc_tb is not None:
             self.file_name = exc_tb.tb_frame.f_code.co_filename
             self.lineno = exc_tb.tb_lineno
-            self.traceback_str = ''.join(traceback.format_exception(exc_type, exc_value, exc_tb))
         else:
             # Fallback when no exception is active
             self.file_name = "unknown"
             self.lineno = 0
-            self.traceback_str = "No traceback available"
+    
+    @cached_property
+    def traceback_str(self):
+        """Formatted traceback, built on first access and then cached."""
+        if self._exc_info[2] is None:
+            return "No traceback available"
+        return ''.join(traceback.format_exception(*self._exc_info))
         
     def __str__(self):
        return f"""
@@ -7,30 +7,251 @@ Usage:
     python ingest_rag_docs.py
 """
 
+import asyncio
+import hashlib
+import json
 import os
 import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import faiss
+import numpy as np
 from dotenv import load_dotenv
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from utils.model_loader import ModelLoader
+from utils.embed_cache import EmbeddingCache
+from utils.vector_index import (
+    IVFPQ_MIN_TRAIN,
+    IVFPQ_NPROBE,
+    MAX_TRAIN_SIZE,
+    TRAINING_POOL_FILE,
+    build_index,
+    build_vectorstore,
+    empty_index_like,
+    load_vectorstore,
+    normalize_vectors,
+    reset_training_pool,
+    save_vectorstore,
+    update_training_pool,
+)
 from logger.custom_logger import CustomLogger
 
+# Optional Rust-backed splitter; much faster than the pure-Python LangChain splitter on long texts
+try:
+    from semantic_text_splitter import TextSplitter as _RustTextSplitter
+    _RUST_SPLITTER_AVAILABLE = True
+except ImportError:
+    _RUST_SPLITTER_AVAILABLE = False
+
 load_dotenv()
 
 log = CustomLogger().get_logger(__name__)
 
+# Google's embedding endpoint accepts up to 100 texts per request
+EMBED_BATCH_SIZE = 100
+# Embedding requests kept in flight at once; bounded to stay inside API rate limits
+EMBED_CONCURRENCY = 8
+# Parsing and chunking are CPU-bound, so default to one worker process per core
+DEFAULT_WORKERS = os.cpu_count() or 1
+# Sidecar recording which PDF versions (and which docstore ids) are already in the index
+MANIFEST_FILE = ".ingested.json"
+
+
+def _file_sha256(path: Path) -> str:
+    """Hash a file's bytes in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _index_stamp(index_file: Path) -> dict:
+    """mtime and size of index.faiss, recorded so a manifest is only trusted for the index it describes."""
+    stat = index_file.stat()
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _uses_inner_product(index_file: Path) -> bool:
+    """Whether a saved index searches by inner product (i.e. it holds unit vectors), read without loading it."""
+    index = faiss.read_index(str(index_file), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    return index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def _load_manifest(manifest_path: Path) -> dict:
+    """Return {"file_hashes": {name: sha256}, "doc_ids": {name: [ids]}, "index_stamp": ...},
+    empty if missing or unreadable."""
+    manifest = {"file_hashes": {}, "doc_ids": {}}
+    try:
+        with open(manifest_path, "r") as fh:
+            manifest.update(json.load(fh))
+    except (OSError, ValueError):
+        pass
+    return manifest
+
+
+def _save_manifest(manifest_path: Path, manifest: dict) -> None:
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def _find_pdfs(docs_path: Path):
+    """List PDFs in docs_path (case-insensitive suffix) with one scandir pass, sorted by name."""
+    with os.scandir(docs_path) as entries:
+        pdf_files = [
+            Path(entry.path) for entry in entries
+            if entry.name.lower().endswith(".pdf") and entry.is_file()
+        ]
+    return sorted(pdf_files, key=lambda p: p.name)
+
+
+def _make_page_splitter(chunk_size: int, chunk_overlap: int):
+    """Return a function that splits one page Document into chunk Documents."""
+    if _RUST_SPLITTER_AVAILABLE:
+        splitter = _RustTextSplitter(chunk_size, overlap=chunk_overlap)
+        return lambda page: [
+            Document(page_content=text, metadata=dict(page.metadata))
+            for text in splitter.chunks(page.page_content)
+        ]
+    
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    )
+    return lambda page: splitter.split_documents([page])
+
+
+def _load_and_split_pdf(path: str, chunk_size: int, chunk_overlap: int):
+    """Stream one PDF page by page and split each page as it arrives (runs in a worker process).
+
+    Only the chunks are kept, so page Documents never accumulate in memory.
+    Returns (page_count, chunks).
+    """
+    split_page = _make_page_splitter(chunk_size, chunk_overlap)
+    page_count = 0
+    chunks = []
+    for page in PyMuPDFLoader(path).lazy_load():
+        page.metadata["source_file"] = Path(path).name
+        page.metadata["source_path"] = path
+        chunks.extend(split_page(page))
+        page_count += 1
+    return page_count, chunks
+
+
+async def _aembed_in_batches(embeddings, texts, batch_size: int, concurrency: int):
+    """Send batches concurrently (at most `concurrency` in flight) so request round-trips overlap."""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def embed_batch(start):
+        batch = texts[start:start + batch_size]
+        async with semaphore:
+            batch_vectors = await embeddings.aembed_documents(batch)
+        log.info("Embedded batch", start=start, size=len(batch), total=len(texts))
+        return batch_vectors
+    
+    results = await asyncio.gather(*(embed_batch(i) for i in range(0, len(texts), batch_size)))
+    return [vector for batch_vectors in results for vector in batch_vectors]
+
+
+def _embed_in_batches(embeddings, texts, batch_size: int = EMBED_BATCH_SIZE,
+                      concurrency: int = EMBED_CONCURRENCY):
+    """Embed texts with one embed_documents request per batch instead of per chunk, in input order.
+
+    Texts are sent shortest-first so each batch holds chunks of similar length.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    sorted_vectors = asyncio.run(
+        _aembed_in_batches(embeddings, [texts[i] for i in order], batch_size, concurrency)
+    )
+    vectors = [None] * len(texts)
+    for i, vector in zip(order, sorted_vectors):
+        vectors[i] = vector
+    return vectors
+
+
+def _dedupe_texts(texts):
+    """Return (unique_texts, inverse) so that unique_texts[inverse[i]] == texts[i]."""
+    first_seen = {}
+    inverse = [first_seen.setdefault(text, len(first_seen)) for text in texts]
+    return list(first_seen), inverse
+
+
+def _embed_with_cache(embeddings, texts, cache: EmbeddingCache):
+    """Return an (N, d) float32 matrix, calling the embedding API only for cache misses.
+
+    Repeated chunks (headers, footers, disclaimers) are embedded once and shared.
+    """
+    unique_texts, inverse = _dedupe_texts(texts)
+    keys = [cache.key(text) for text in unique_texts]
+    cached = cache.get_many(keys)
+    
+    missing = {key: text for key, text in zip(keys, unique_texts) if key not in cached}
+    log.info(
+        "Embedding cache lookup",
+        duplicates=len(texts) - len(unique_texts),
+        hits=len(unique_texts) - len(missing),
+        misses=len(missing),
+    )
+    print(
+        f"  Embedding cache: {len(texts) - len(unique_texts)} duplicate chunks, "
+        f"{len(unique_texts) - len(missing)} hits, {len(missing)} misses"
+    )
+    
+    if missing:
+        new_vectors = _embed_in_batches(embeddings, list(missing.values()))
+        fresh = dict(zip(missing.keys(), new_vectors))
+        cache.put_many(fresh)
+        cached.update(fresh)
+    
+    unique_vectors = np.array([cached[key] for key in keys], dtype=np.float32)
+    return unique_vectors[inverse]
+
+
+def _rebuild_vectorstore(vectorstore, embeddings, cache: EmbeddingCache, make_index,
+                         texts, vectors, metadatas, ids, drop_ids=()):
+    """Build a fresh store holding the existing chunks (minus drop_ids) plus the new ones.
+
+    make_index(all_vectors) must return an empty, trained FAISS index.
+    """
+    drop = set(drop_ids)
+    keep_ids = [
+        doc_id for _, doc_id in sorted(vectorstore.index_to_docstore_id.items()) if doc_id not in drop
+    ]
+    docs = [vectorstore.docstore.search(doc_id) for doc_id in keep_ids]
+    old_texts = [doc.page_content for doc in docs]
+    if old_texts:
+        # Existing chunks were cached when first ingested, so this is normally API-free
+        old_vectors = normalize_vectors(_embed_with_cache(embeddings, old_texts, cache))
+    else:
+        old_vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+    
+    all_vectors = np.concatenate([old_vectors, vectors])
+    return build_vectorstore(
+        embeddings,
+        make_index(all_vectors),
+        old_texts + list(texts),
+        all_vectors,
+        [doc.metadata for doc in docs] + list(metadatas),
+        ids=keep_ids + list(ids),
+    )
+
 
 def ingest_documents(
     docs_dir: str = "data/rag_docs",
     vectorstore_dir: str = "rag/vectorstore",
     chunk_size: int = 800,
-    chunk_overlap: int = 200
+    chunk_overlap: int = 200,
+    max_workers: int = DEFAULT_WORKERS,
 ):
     """
     Load all PDFs from docs_dir, chunk them, and create/update FAISS index.
@@ -40,6 +261,7 @@ def ingest_documents(
         vectorstore_dir: Directory to save FAISS index
         chunk_size: Size of text chunks
         chunk_overlap: Overlap between chunks
+        max_workers: Worker processes used to parse and chunk PDFs
     """
     
     # Check for API keys
@@ -64,7 +286,7 @@ def ingest_documents(
         sys.exit(1)
     
     # Find all PDF files
-    pdf_files = list(docs_path.glob("*.pdf"))
+    pdf_files = _find_pdfs(docs_path)
     
     if not pdf_files:
         log.warning("No PDF files found in RAG docs directory", path=str(docs_path))
@@ -72,10 +294,54 @@ def ingest_documents(
         print("Please add emotional wellness PDFs to ingest.\n")
         sys.exit(1)
     
-    log.info("Found PDF files for ingestion", count=len(pdf_files), files=[f.name for f in pdf_files])
-    print(f"\n📚 Found {len(pdf_files)} PDF files to ingest:\n")
+    # Skip PDFs whose bytes match what the existing index was built from
+    index_file = vectorstore_path / "index.faiss"
+    manifest_path = vectorstore_path / MANIFEST_FILE
+    manifest = {"file_hashes": {}, "doc_ids": {}}
+    update_existing = False
+    if index_file.exists():
+        saved = _load_manifest(manifest_path)
+        try:
+            inner_product = _uses_inner_product(index_file)
+        except RuntimeError as e:
+            inner_product = None
+            log.warning("Existing index could not be read, rebuilding", path=str(index_file), error=str(e))
+            print(f"\n⚠️  The existing index could not be read ({e}); rebuilding it from all PDFs.")
+        if inner_product is False:
+            # Pre-normalization L2 stores hold raw vectors; appending unit vectors would skew ranking
+            log.warning("Existing index uses L2 distance, rebuilding for cosine search", path=str(index_file))
+            print("\n⚠️  The existing index uses L2 distance; rebuilding it with normalized vectors from all PDFs.")
+        elif inner_product and saved.get("index_stamp") == _index_stamp(index_file):
+            manifest = saved
+            update_existing = True
+        elif inner_product:
+            # Written before manifests existed or overwritten by another writer (e.g. /rag/ingest):
+            # its contents are unknown, so appending would duplicate or mix chunks
+            log.warning("Ingest manifest does not match existing index, rebuilding", path=str(index_file))
+            print("\n⚠️  The existing index is not described by the ingest manifest; rebuilding it from all PDFs.")
+    file_hashes = {pdf.name: _file_sha256(pdf) for pdf in pdf_files}
+    unchanged = [pdf for pdf in pdf_files if manifest["file_hashes"].get(pdf.name) == file_hashes[pdf.name]]
+    # Deleted or renamed since the last run: their chunks must leave the index
+    removed = sorted(set(manifest["file_hashes"]) - set(file_hashes))
+    pdf_files = [pdf for pdf in pdf_files if pdf not in unchanged]
+    
+    if not pdf_files and not removed:
+        log.info("All PDFs already ingested and unchanged", count=len(unchanged), path=str(vectorstore_path))
+        print(f"\n✅ All {len(unchanged)} PDFs are already in the index and unchanged; nothing to do.\n")
+        return
+    
+    log.info("Found PDF files for ingestion", count=len(pdf_files), files=[f.name for f in pdf_files],
+             unchanged=len(unchanged))
+    print(f"\n📚 Found {len(pdf_files)} new or changed PDF files to ingest:\n")
     for pdf in pdf_files:
         print(f"  - {pdf.name}")
+    if unchanged:
+        print(f"\n  (skipping {len(unchanged)} unchanged PDFs)")
+    if removed:
+        log.info("PDFs removed since last ingest", files=removed)
+        print(f"\n🗑️  Removing {len(removed)} PDFs no longer in {docs_path}:")
+        for name in removed:
+            print(f"  - {name}")
     print()
     
     # Load model loader
@@ -91,85 +357,188 @@ def ingest_documents(
         print(f"\n❌ Failed to load embeddings model: {e}\n")
         sys.exit(1)
     
-    # Load and process documents
-    all_documents = []
+    # Load, stream and split documents
+    chunks = []
+    loaded_files = []
+    total_pages = 0
     
-    print("📖 Loading PDFs...")
-    for pdf_file in pdf_files:
-        try:
-            log.info("Loading PDF", file=pdf_file.name)
-            print(f"  Loading {pdf_file.name}...", end=" ")
-            
-            loader = PyPDFLoader(str(pdf_file))
-            docs = loader.load()
-            
-            # Add source metadata
-            for doc in docs:
-                doc.metadata["source_file"] = pdf_file.name
-                doc.metadata["source_path"] = str(pdf_file)
-            
-            all_documents.extend(docs)
-            print(f"✓ ({len(docs)} pages)")
-            log.info("PDF loaded", file=pdf_file.name, pages=len(docs))
-            
-        except Exception as e:
-            log.error("Failed to load PDF", file=pdf_file.name, error=str(e))
-            print(f"✗ Error: {e}")
-            continue
+    print(f"📖 Loading PDFs and splitting into chunks (size={chunk_size}, overlap={chunk_overlap})...")
+    # PDF parsing and splitting are CPU-bound, so parse and chunk each file in its own process
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(pdf_files)))) as executor:
+        # Submit the largest files first so a big PDF doesn't start last and stall the pool
+        by_size = sorted(pdf_files, key=lambda p: p.stat().st_size, reverse=True)
+        futures = {
+            pdf_file: executor.submit(_load_and_split_pdf, str(pdf_file), chunk_size, chunk_overlap)
+            for pdf_file in by_size
+        }
+        
+        for pdf_file in pdf_files:
+            future = futures[pdf_file]
+            try:
+                log.info("Loading PDF", file=pdf_file.name)
+                print(f"  Loading {pdf_file.name}...", end=" ")
+                
+                pages, pdf_chunks = future.result()
+                
+                chunks.extend(pdf_chunks)
+                loaded_files.append(pdf_file.name)
+                total_pages += pages
+                print(f"✓ ({pages} pages, {len(pdf_chunks)} chunks)")
+                log.info("PDF loaded", file=pdf_file.name, pages=pages, chunks=len(pdf_chunks))
+                
+            except Exception as e:
+                log.error("Failed to load PDF", file=pdf_file.name, error=str(e))
+                print(f"✗ Error: {e}")
+                continue
     
-    if not all_documents:
+    if not chunks and not removed:
         log.error("No documents loaded successfully")
         print("\n❌ No documents were loaded successfully.\n")
         sys.exit(1)
     
-    total_pages = len(all_documents)
-    log.info("All PDFs loaded", total_pages=total_pages)
-    print(f"\n✅ Loaded {total_pages} total pages\n")
+    log.info("All PDFs loaded and split", total_pages=total_pages, chunks=len(chunks))
+    print(f"\n✅ Loaded {total_pages} total pages into {len(chunks)} chunks\n")
     
-    # Split into chunks
-    print(f"✂️  Splitting into chunks (size={chunk_size}, overlap={chunk_overlap})...")
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-    )
-    chunks = splitter.split_documents(all_documents)
-    log.info("Documents split into chunks", count=len(chunks))
-    print(f"✅ Created {len(chunks)} chunks\n")
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    ids = [str(uuid.uuid4()) for _ in chunks]
     
     # Create or update FAISS index
     print("🔨 Building FAISS vector index (this may take a while)...")
     vectorstore_path.mkdir(parents=True, exist_ok=True)
     
+    vectorstore_config = model_loader.config.get("vectorstore", {})
+    index_type = vectorstore_config.get("index_type", "hnsw")
+    nprobe = vectorstore_config.get("ivfpq_nprobe", IVFPQ_NPROBE)
+    encoding = vectorstore_config.get("vector_encoding", "fp32")
+    max_train_size = vectorstore_config.get("max_train_size", MAX_TRAIN_SIZE)
+    pool_path = vectorstore_path / TRAINING_POOL_FILE
+    
+    cache = None
     try:
-        # Check if existing index exists
-        index_file = vectorstore_path / "index.faiss"
+        print(f"  Embedding {len(texts)} chunks in batches of {EMBED_BATCH_SIZE}...")
+        cache = EmbeddingCache(
+            vectorstore_path / "embedding_cache.sqlite",
+            model_loader.config["embedding_model"]["model_name"],
+        )
+        # Unit-normalize once here so inner-product search is cosine similarity
+        vectors = normalize_vectors(_embed_with_cache(embeddings, texts, cache)) if texts else None
         
-        if index_file.exists():
+        if update_existing:
             log.info("Existing FAISS index found, loading...")
             print("  Found existing index, loading...")
-            vectorstore = FAISS.load_local(
-                str(vectorstore_path),
-                embeddings,
-                allow_dangerous_deserialization=True
+            vectorstore = load_vectorstore(vectorstore_path, embeddings)
+            if vectors is None:
+                # Only removals this run
+                vectors = np.empty((0, vectorstore.index.d), dtype=np.float32)
+            
+            # Chunks from the previous version of each re-ingested PDF, and of removed PDFs
+            present_ids = set(vectorstore.index_to_docstore_id.values())
+            obsolete_ids = [
+                doc_id for name in loaded_files + removed
+                for doc_id in manifest["doc_ids"].get(name, []) if doc_id in present_ids
+            ]
+            
+            pool, pool_size = None, 0
+            if index_type == "ivfpq":
+                pool = update_training_pool(pool_path, vectors, max_train_size)
+                pool_size = len(pool)
+            
+            # A store that fell back to flat while too small to train becomes IVF-PQ once it can be
+            store_size = vectorstore.index.ntotal - len(obsolete_ids) + len(vectors)
+            upgrade = (
+                index_type == "ivfpq"
+                and not isinstance(vectorstore.index, faiss.IndexIVF)
+                and store_size >= IVFPQ_MIN_TRAIN
             )
-            log.info("Adding new documents to existing index")
-            print("  Adding new documents to existing index...")
-            vectorstore.add_documents(chunks)
+            
+            # Retrain IVF centroids once enough fresh vectors have accumulated (or train them for the first time)
+            if upgrade or pool_size >= max_train_size:
+                log.info("Rebuilding IVF index", upgrade=upgrade, pool_size=pool_size, store_size=store_size)
+                if pool_size >= max_train_size:
+                    print(f"  Retraining IVF centroids on {pool_size} recent vectors...")
+                    train_vectors = np.asarray(pool)
+                else:
+                    print(f"  Upgrading index to IVF-PQ now that it holds {store_size} vectors...")
+                    train_vectors = None
+                vectorstore = _rebuild_vectorstore(
+                    vectorstore, embeddings, cache,
+                    lambda v: build_index(
+                        index_type, v, nprobe=nprobe,
+                        train_vectors=train_vectors if train_vectors is not None else v[-max_train_size:],
+                        encoding=encoding,
+                    ),
+                    texts, vectors, metadatas, ids, drop_ids=obsolete_ids,
+                )
+                del pool, train_vectors
+                reset_training_pool(pool_path)
+            else:
+                rebuilt = False
+                if obsolete_ids:
+                    log.info("Removing chunks of changed or removed PDFs", count=len(obsolete_ids))
+                    print(f"  Removing {len(obsolete_ids)} chunks of changed or removed PDFs...")
+                    if isinstance(vectorstore.index, faiss.IndexIVF):
+                        # IVF remove_ids keeps the other labels while LangChain renumbers its
+                        # position map, so refill an empty copy of the trained index instead
+                        trained = vectorstore.index
+                        vectorstore = _rebuild_vectorstore(
+                            vectorstore, embeddings, cache, lambda v: empty_index_like(trained),
+                            texts, vectors, metadatas, ids, drop_ids=obsolete_ids,
+                        )
+                        rebuilt = True
+                    else:
+                        try:
+                            vectorstore.delete(obsolete_ids)
+                        except RuntimeError:
+                            # HNSW graphs can't remove vectors, so rebuild without the obsolete chunks
+                            vectorstore = _rebuild_vectorstore(
+                                vectorstore, embeddings, cache,
+                                lambda v: build_index(index_type, v, nprobe=nprobe, encoding=encoding),
+                                texts, vectors, metadatas, ids, drop_ids=obsolete_ids,
+                            )
+                            rebuilt = True
+                if not rebuilt and texts:
+                    log.info("Adding new documents to existing index")
+                    print("  Adding new documents to existing index...")
+                    vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
         else:
-            log.info("Creating new FAISS index")
-            print("  Creating new FAISS index...")
-            vectorstore = FAISS.from_documents(chunks, embeddings)
+            log.info("Creating new FAISS index", index_type=index_type, encoding=encoding)
+            print(f"  Creating new FAISS index (type={index_type}, encoding={encoding})...")
+            index = build_index(
+                index_type,
+                vectors,
+                nprobe=nprobe,
+                train_vectors=vectors[-max_train_size:],
+                encoding=encoding,
+            )
+            vectorstore = build_vectorstore(embeddings, index, texts, vectors, metadatas, ids=ids)
+            # A pool left over from a deleted index no longer matches these centroids
+            reset_training_pool(pool_path)
         
-        # Save the index
-        vectorstore.save_local(str(vectorstore_path))
+        # Save the index (swapped in atomically: a running retriever may have it memory-mapped)
+        save_vectorstore(vectorstore, vectorstore_path)
         log.info("FAISS index saved", path=str(vectorstore_path))
         print(f"✅ FAISS index saved to: {vectorstore_path}\n")
         
+        # Record what is now indexed so unchanged PDFs are skipped next run
+        for name in removed:
+            manifest["file_hashes"].pop(name, None)
+            manifest["doc_ids"].pop(name, None)
+        for name in loaded_files:
+            manifest["file_hashes"][name] = file_hashes[name]
+            manifest["doc_ids"][name] = []
+        for doc_id, metadata in zip(ids, metadatas):
+            manifest["doc_ids"][metadata["source_file"]].append(doc_id)
+        manifest["index_stamp"] = _index_stamp(index_file)
+        _save_manifest(manifest_path, manifest)
+        
     except Exception as e:
         log.error("Failed to create FAISS index", error=str(e))
         print(f"\n❌ Failed to create FAISS index: {e}\n")
         sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
     
     # Summary
     print("=" * 60)
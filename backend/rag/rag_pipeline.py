@@ -14,6 +14,7 @@ from langchain_community.chat_message_histories import ChatMessageHistory  # typ
 from langchain_core.runnables.history import RunnableWithMessageHistory  # type: ignore
 
 from utils.model_loader import ModelLoader
+from utils.vector_index import load_vectorstore, save_vectorstore
 from exception.custom_exception import DocumentPortalException
 from logger.custom_logger import CustomLogger
 from prompts.prompt_lib import PROMPT_REGISTRY  
@@ -83,7 +84,7 @@ class SingleDocumentIngestor:
             vectorstore = FAISS.from_documents(documents=chunks, embedding=embeddings)
 
             # Save FAISS index to disk
-            vectorstore.save_local(str(self.faiss_dir))
+            save_vectorstore(vectorstore, self.faiss_dir)
             self.log.info("FAISS index created and saved", path=str(self.faiss_dir))
 
             retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
@@ -154,8 +155,9 @@ class ConversationalRAG:
             if not os.path.isdir(self.faiss_dir):
                 raise FileNotFoundError(f"FAISS index directory not found at {self.faiss_dir}")
 
-            # allow_dangerous_deserialization=True to avoid LC pickling guard issues
-            vectorstore = FAISS.load_local(self.faiss_dir, embeddings, allow_dangerous_deserialization=True)
+            # Picks the distance strategy from the saved index (inner-product indexes normalize queries);
+            # the retriever is read-only, so memory-map the index instead of reading it into RAM
+            vectorstore = load_vectorstore(self.faiss_dir, embeddings, mmap=True)
             self.log.info("FAISS retriever loaded successfully", index_path=self.faiss_dir)
             return vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
 
@@ -171,9 +173,8 @@ class ConversationalRAG:
             embeddings = ModelLoader().load_embeddings()
             vectorstore = FAISS.from_documents(documents=documents, embedding=embeddings)
             
-            # Create directory if it doesn't exist
-            os.makedirs(self.faiss_dir, exist_ok=True)
-            vectorstore.save_local(self.faiss_dir)
+            # Swaps the files in, so retrievers with the old index mapped keep working
+            save_vectorstore(vectorstore, self.faiss_dir)
             
             self.log.info("Documents indexed and saved", count=len(documents), path=self.faiss_dir)
             return vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
@@ -11,7 +11,7 @@ Provides mocks for:
 import os
 import sys
 import pytest
-from unittest.mock import MagicMock, Mock
+from unittest.mock import AsyncMock, MagicMock, Mock
 from typing import Dict, Any
 
 # Ensure the backend root is on sys.path for absolute imports like `core.*` and `rag.*`
@@ -78,6 +78,8 @@ def mock_embeddings():
     embeddings = MagicMock()
     embeddings.embed_documents.return_value = [[0.1] * 768 for _ in range(5)]
     embeddings.embed_query.return_value = [0.1] * 768
+    # async variant delegates so tests can configure/inspect embed_documents only
+    embeddings.aembed_documents = AsyncMock(side_effect=lambda texts: embeddings.embed_documents(texts))
     return embeddings
 
 
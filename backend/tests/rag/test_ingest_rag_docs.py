@@ -0,0 +1,425 @@
+"""
+Unit tests for the offline RAG ingestion script.
+
+Tests:
+- Batched embedding of chunk texts
+- Embedding cache hits/misses
+- Rebuilding a store (IVF retraining, dropping obsolete chunks)
+- Per-page chunking with either splitter backend
+- PDF discovery
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+import ingest_rag_docs
+from ingest_rag_docs import (
+    _embed_in_batches,
+    _embed_with_cache,
+    _find_pdfs,
+    _make_page_splitter,
+    _rebuild_vectorstore,
+    ingest_documents,
+)
+from utils.embed_cache import EmbeddingCache
+from utils.vector_index import build_index, build_vectorstore
+
+
+@pytest.mark.unit
+class TestBatchedEmbedding:
+    """Test that chunk texts are embedded in batches."""
+
+    def test_embeds_in_batches(self, mock_embeddings):
+        # arrange
+        mock_embeddings.embed_documents.side_effect = lambda batch: [[float(len(t))] for t in batch]
+        texts = [f"chunk {i}" for i in range(250)]
+
+        # act
+        vectors = _embed_in_batches(mock_embeddings, texts, batch_size=100)
+
+        # assert
+        assert len(vectors) == 250
+        assert mock_embeddings.embed_documents.call_count == 3
+        assert [len(c.args[0]) for c in mock_embeddings.embed_documents.call_args_list] == [100, 100, 50]
+
+    def test_preserves_order(self, mock_embeddings):
+        # arrange
+        mock_embeddings.embed_documents.side_effect = lambda batch: [[float(t)] for t in batch]
+        texts = [str(i) for i in range(7)]
+
+        # act
+        vectors = _embed_in_batches(mock_embeddings, texts, batch_size=3)
+
+        # assert
+        assert vectors == [[float(i)] for i in range(7)]
+
+    def test_batches_hold_similar_lengths(self, mock_embeddings):
+        # arrange
+        mock_embeddings.embed_documents.side_effect = lambda batch: [[float(len(t))] for t in batch]
+        texts = ["x" * n for n in [9, 1, 8, 2, 7, 3]]
+
+        # act
+        vectors = _embed_in_batches(mock_embeddings, texts, batch_size=2)
+
+        # assert
+        assert [c.args[0] for c in mock_embeddings.embed_documents.call_args_list] == [
+            ["x", "xx"], ["xxx", "xxxxxxx"], ["xxxxxxxx", "xxxxxxxxx"]
+        ]
+        assert vectors == [[9.0], [1.0], [8.0], [2.0], [7.0], [3.0]]
+
+    def test_limits_requests_in_flight(self, mock_embeddings):
+        # arrange
+        state = {"active": 0, "peak": 0}
+
+        async def slow_embed(batch):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return [[0.0] for _ in batch]
+
+        mock_embeddings.aembed_documents.side_effect = slow_embed
+
+        # act
+        vectors = _embed_in_batches(mock_embeddings, [str(i) for i in range(10)], batch_size=1, concurrency=3)
+
+        # assert
+        assert len(vectors) == 10
+        assert state["peak"] == 3
+
+
+@pytest.mark.unit
+class TestCachedEmbedding:
+    """Test that only cache misses reach the embedding API."""
+
+    def test_only_misses_are_embedded(self, tmp_path, mock_embeddings):
+        # arrange
+        cache = EmbeddingCache(tmp_path / "cache.sqlite", "test-embedding")
+        cache.put_many({cache.key("seen"): [1.0, 1.0]})
+        mock_embeddings.embed_documents.side_effect = lambda batch: [[2.0, 2.0] for _ in batch]
+
+        # act
+        vectors = _embed_with_cache(mock_embeddings, ["seen", "new"], cache)
+        cache.close()
+
+        # assert
+        mock_embeddings.embed_documents.assert_called_once_with(["new"])
+        assert vectors.shape == (2, 2)
+        assert vectors[0].tolist() == [1.0, 1.0]
+        assert vectors[1].tolist() == [2.0, 2.0]
+
+    def test_duplicate_chunks_embedded_once(self, tmp_path, mock_embeddings):
+        # arrange
+        cache = EmbeddingCache(tmp_path / "cache.sqlite", "test-embedding")
+        mock_embeddings.embed_documents.side_effect = lambda batch: [[float(len(t)), 0.0] for t in batch]
+        texts = ["Disclaimer: not medical advice", "breathe", "Disclaimer: not medical advice"]
+
+        # act
+        vectors = _embed_with_cache(mock_embeddings, texts, cache)
+        cache.close()
+
+        # assert
+        mock_embeddings.embed_documents.assert_called_once_with(["breathe", "Disclaimer: not medical advice"])
+        assert vectors.shape == (3, 2)
+        assert vectors[0].tolist() == vectors[2].tolist()
+        assert vectors[1].tolist() == [7.0, 0.0]
+
+
+@pytest.mark.unit
+class TestRebuildVectorstore:
+    """Test rebuilding a store on a fresh index."""
+
+    def test_retrain_keeps_old_and_adds_new(self, tmp_path, mock_embeddings):
+        # arrange
+        rng = np.random.default_rng(0)
+        cache = EmbeddingCache(tmp_path / "cache.sqlite", "test-embedding")
+        old_texts = [f"old {i}" for i in range(300)]
+        old_vectors = rng.random((300, 16), dtype=np.float32)
+        cache.put_many({cache.key(t): v for t, v in zip(old_texts, old_vectors)})
+        store = build_vectorstore(
+            mock_embeddings,
+            build_index("ivfpq", old_vectors),
+            old_texts,
+            old_vectors,
+            [{"i": i} for i in range(300)],
+        )
+        old_ids = set(store.index_to_docstore_id.values())
+        new_vectors = rng.random((20, 16), dtype=np.float32)
+        pool = np.concatenate([old_vectors, new_vectors])
+
+        # act
+        rebuilt = _rebuild_vectorstore(
+            store, mock_embeddings, cache,
+            lambda v: build_index("ivfpq", v, nprobe=4, train_vectors=pool),
+            [f"new {i}" for i in range(20)], new_vectors, [{"i": 300 + i} for i in range(20)],
+            [f"new-id-{i}" for i in range(20)],
+        )
+        cache.close()
+
+        # assert
+        mock_embeddings.embed_documents.assert_not_called()
+        assert rebuilt.index.ntotal == 320
+        assert rebuilt.index.nprobe == 4
+        assert old_ids <= set(rebuilt.index_to_docstore_id.values())
+
+    def test_drop_ids_are_removed(self, tmp_path, mock_embeddings):
+        # arrange
+        cache = EmbeddingCache(tmp_path / "cache.sqlite", "test-embedding")
+        vectors = np.eye(4, dtype=np.float32)
+        texts = [f"t{i}" for i in range(4)]
+        cache.put_many({cache.key(t): v for t, v in zip(texts, vectors)})
+        store = build_vectorstore(
+            mock_embeddings, build_index("hnsw", vectors), texts, vectors, [{}] * 4, ids=["a", "b", "c", "d"]
+        )
+
+        # act
+        rebuilt = _rebuild_vectorstore(
+            store, mock_embeddings, cache, lambda v: build_index("hnsw", v),
+            [], np.empty((0, 4), dtype=np.float32), [], [], drop_ids=["b", "d"],
+        )
+        cache.close()
+
+        # assert
+        assert rebuilt.index.ntotal == 2
+        assert sorted(rebuilt.index_to_docstore_id.values()) == ["a", "c"]
+
+
+@pytest.mark.unit
+class TestPageSplitter:
+    """Test chunking a single page with the Rust or LangChain splitter."""
+
+    @pytest.mark.parametrize("use_rust", [True, False])
+    def test_chunks_respect_size_and_keep_metadata(self, monkeypatch, use_rust):
+        if use_rust and not ingest_rag_docs._RUST_SPLITTER_AVAILABLE:
+            pytest.skip("semantic-text-splitter not installed")
+        monkeypatch.setattr(ingest_rag_docs, "_RUST_SPLITTER_AVAILABLE", use_rust)
+        page = Document(page_content="Name the feeling, then breathe. " * 100, metadata={"source_file": "a.pdf"})
+
+        chunks = _make_page_splitter(200, 50)(page)
+
+        assert len(chunks) > 1
+        assert all(len(c.page_content) <= 200 for c in chunks)
+        assert all(c.metadata == {"source_file": "a.pdf"} for c in chunks)
+        chunks[0].metadata["page"] = 3
+        assert "page" not in page.metadata
+
+
+@pytest.mark.unit
+class TestFindPdfs:
+    """Test PDF discovery in the docs directory."""
+
+    def test_matches_pdf_suffix_case_insensitively(self, tmp_path):
+        for name in ["b.pdf", "A.PDF", "notes.txt"]:
+            (tmp_path / name).write_bytes(b"%PDF-1.4")
+        (tmp_path / "folder.pdf").mkdir()
+
+        pdf_files = _find_pdfs(tmp_path)
+
+        assert [p.name for p in pdf_files] == ["A.PDF", "b.pdf"]
+
+
+def _write_pdf(path, lines):
+    import fitz  # PyMuPDF
+
+    pdf = fitz.open()
+    for line in lines:
+        pdf.new_page().insert_text((72, 72), line)
+    pdf.save(str(path))
+    pdf.close()
+
+
+@pytest.fixture
+def ingest_env(tmp_path, monkeypatch):
+    """Docs/store dirs with two PDFs, a fake embeddings model and a counter of embedded texts."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    embeddings = DeterministicFakeEmbedding(size=16)
+    calls = []
+    original = embeddings.embed_documents
+    monkeypatch.setattr(
+        type(embeddings), "embed_documents", lambda self, texts: calls.append(len(texts)) or original(texts)
+    )
+    config = {"embedding_model": {"model_name": "fake"}, "vectorstore": {"index_type": "flat"}}
+
+    class FakeModelLoader:
+        def __init__(self):
+            self.config = config
+
+        def load_embeddings(self):
+            return embeddings
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(ingest_rag_docs, "ModelLoader", FakeModelLoader)
+    docs_dir, store_dir = tmp_path / "docs", tmp_path / "store"
+    docs_dir.mkdir()
+    _write_pdf(docs_dir / "a.pdf", ["Box breathing calms the body.", "Name the feeling."])
+    _write_pdf(docs_dir / "b.pdf", ["Gratitude practice before sleep."])
+
+    def ingest():
+        ingest_documents(str(docs_dir), str(store_dir), max_workers=1)
+
+    def stored_texts():
+        from utils.vector_index import load_vectorstore
+
+        store = load_vectorstore(store_dir, embeddings)
+        assert store.index.ntotal == len(store.docstore._dict)
+        return sorted(doc.page_content for doc in store.docstore._dict.values())
+
+    return SimpleNamespace(
+        docs_dir=docs_dir, store_dir=store_dir, embeddings=embeddings, calls=calls, config=config,
+        ingest=ingest, stored_texts=stored_texts,
+    )
+
+
+@pytest.mark.integration
+class TestIncrementalIngest:
+    """Test that the manifest skips unchanged PDFs and replaces changed ones."""
+
+    @pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+    def test_reingest_skips_and_replaces(self, ingest_env, index_type):
+        ingest_env.config["vectorstore"]["index_type"] = index_type
+
+        ingest_env.ingest()
+        first_calls = len(ingest_env.calls)
+        ingest_env.ingest()
+        assert len(ingest_env.calls) == first_calls  # unchanged PDFs: early exit, no embedding
+
+        _write_pdf(ingest_env.docs_dir / "b.pdf", ["Perspective taking with a friend."])
+        ingest_env.ingest()
+
+        assert ingest_env.stored_texts() == [
+            "Box breathing calms the body.",
+            "Name the feeling.",
+            "Perspective taking with a friend.",
+        ]
+
+    @pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+    def test_deleted_pdf_leaves_the_index(self, ingest_env, index_type):
+        ingest_env.config["vectorstore"]["index_type"] = index_type
+        ingest_env.ingest()
+        first_calls = len(ingest_env.calls)
+
+        (ingest_env.docs_dir / "b.pdf").unlink()
+        ingest_env.ingest()
+
+        assert len(ingest_env.calls) == first_calls  # removal only: nothing embedded
+        assert ingest_env.stored_texts() == ["Box breathing calms the body.", "Name the feeling."]
+        manifest = ingest_rag_docs._load_manifest(ingest_env.store_dir / ingest_rag_docs.MANIFEST_FILE)
+        assert set(manifest["file_hashes"]) == set(manifest["doc_ids"]) == {"a.pdf"}
+
+    def test_ivfpq_removals_keep_ids_in_sync(self, ingest_env):
+        import faiss
+
+        ingest_env.config["vectorstore"].update(index_type="ivfpq", max_train_size=1000)
+        _write_pdf(ingest_env.docs_dir / "c.pdf", [f"Page {i} of c: breathe slowly." for i in range(200)])
+        _write_pdf(ingest_env.docs_dir / "d.pdf", [f"Page {i} of d: notice the feeling." for i in range(200)])
+        ingest_env.ingest()
+        assert isinstance(faiss.read_index(str(ingest_env.store_dir / "index.faiss")), faiss.IndexIVFPQ)
+
+        # two removals in a row: the second must still find the right positions
+        (ingest_env.docs_dir / "c.pdf").rename(ingest_env.docs_dir / "c2.pdf")
+        ingest_env.ingest()
+        (ingest_env.docs_dir / "d.pdf").unlink()
+        ingest_env.ingest()
+
+        texts = ingest_env.stored_texts()
+        assert len(texts) == 203
+        assert not any("of d:" in text for text in texts)
+
+    def test_renamed_pdf_is_not_duplicated(self, ingest_env):
+        ingest_env.ingest()
+
+        (ingest_env.docs_dir / "b.pdf").rename(ingest_env.docs_dir / "b2.pdf")
+        ingest_env.ingest()
+
+        assert ingest_env.stored_texts() == [
+            "Box breathing calms the body.",
+            "Gratitude practice before sleep.",
+            "Name the feeling.",
+        ]
+
+    def test_index_overwritten_by_another_writer_is_rebuilt(self, ingest_env):
+        from langchain_community.vectorstores import FAISS
+
+        ingest_env.ingest()
+        # what SingleDocumentIngestor does when /rag/ingest targets the same directory
+        FAISS.from_texts(["uploaded doc"], ingest_env.embeddings).save_local(str(ingest_env.store_dir))
+
+        ingest_env.ingest()
+
+        assert ingest_env.stored_texts() == [
+            "Box breathing calms the body.",
+            "Gratitude practice before sleep.",
+            "Name the feeling.",
+        ]
+
+    def test_index_without_manifest_is_rebuilt_not_appended(self, ingest_env):
+        ingest_env.ingest()
+        (ingest_env.store_dir / ingest_rag_docs.MANIFEST_FILE).unlink()
+
+        ingest_env.ingest()
+
+        assert ingest_env.stored_texts() == [
+            "Box breathing calms the body.",
+            "Gratitude practice before sleep.",
+            "Name the feeling.",
+        ]
+
+    def test_unreadable_index_is_rebuilt(self, ingest_env):
+        ingest_env.ingest()
+        (ingest_env.store_dir / "index.faiss").write_bytes(b"not a faiss index")
+
+        ingest_env.ingest()
+
+        assert ingest_env.stored_texts() == [
+            "Box breathing calms the body.",
+            "Gratitude practice before sleep.",
+            "Name the feeling.",
+        ]
+
+    def test_l2_index_with_manifest_is_rebuilt_as_inner_product(self, ingest_env):
+        import faiss
+        from langchain_community.vectorstores import FAISS
+
+        ingest_env.ingest()
+        # a pre-normalization store: raw vectors in an L2 index, with a manifest that matches it
+        legacy = FAISS.from_texts(["Box breathing calms the body."], ingest_env.embeddings)
+        legacy.save_local(str(ingest_env.store_dir))
+        manifest_path = ingest_env.store_dir / ingest_rag_docs.MANIFEST_FILE
+        manifest = ingest_rag_docs._load_manifest(manifest_path)
+        manifest["index_stamp"] = ingest_rag_docs._index_stamp(ingest_env.store_dir / "index.faiss")
+        ingest_rag_docs._save_manifest(manifest_path, manifest)
+        _write_pdf(ingest_env.docs_dir / "b.pdf", ["Perspective taking with a friend."])
+
+        ingest_env.ingest()
+
+        index = faiss.read_index(str(ingest_env.store_dir / "index.faiss"))
+        assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+        assert ingest_env.stored_texts() == [
+            "Box breathing calms the body.",
+            "Name the feeling.",
+            "Perspective taking with a friend.",
+        ]
+
+    def test_flat_fallback_upgrades_to_ivfpq_once_trainable(self, ingest_env):
+        import faiss
+
+        ingest_env.config["vectorstore"].update(index_type="ivfpq", max_train_size=1000)
+        ingest_env.ingest()
+        assert not isinstance(faiss.read_index(str(ingest_env.store_dir / "index.faiss")), faiss.IndexIVF)
+
+        _write_pdf(ingest_env.docs_dir / "c.pdf", ["Journal one worry."])
+        ingest_env.ingest()
+        assert (ingest_env.store_dir / "training_pool.npy").exists()
+
+        _write_pdf(ingest_env.docs_dir / "d.pdf", [f"Exercise {i}: notice your breath." for i in range(260)])
+        ingest_env.ingest()
+
+        index = faiss.read_index(str(ingest_env.store_dir / "index.faiss"))
+        assert isinstance(index, faiss.IndexIVFPQ)
+        assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+        assert len(ingest_env.stored_texts()) == 264
+        assert not (ingest_env.store_dir / "training_pool.npy").exists()
@@ -0,0 +1,46 @@
+"""
+Unit tests for the SQLite-backed embedding cache.
+"""
+
+import numpy as np
+import pytest
+from utils.embed_cache import EmbeddingCache
+
+
+@pytest.mark.unit
+class TestEmbeddingCache:
+    """Test cache keying and round-tripping of vectors."""
+
+    def test_round_trip(self, tmp_path):
+        cache = EmbeddingCache(tmp_path / "cache.sqlite", "test-embedding")
+        key = cache.key("breathe in for four counts")
+        cache.put_many({key: [0.1, 0.2, 0.3]})
+
+        found = cache.get_many([key, cache.key("missing")])
+        cache.close()
+
+        assert list(found) == [key]
+        assert np.allclose(found[key], [0.1, 0.2, 0.3])
+        assert found[key].dtype == np.float32
+
+    def test_key_depends_on_model(self, tmp_path):
+        a = EmbeddingCache(tmp_path / "a.sqlite", "model-a")
+        b = EmbeddingCache(tmp_path / "b.sqlite", "model-b")
+
+        assert a.key("same text") != b.key("same text")
+        assert a.key("same text") == a.key("same text")
+        a.close()
+        b.close()
+
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "cache.sqlite"
+        cache = EmbeddingCache(path, "test-embedding")
+        key = cache.key("journal prompt")
+        cache.put_many({key: [1.0] * 768})
+        cache.close()
+
+        reopened = EmbeddingCache(path, "test-embedding")
+        found = reopened.get_many([key])
+        reopened.close()
+
+        assert found[key].shape == (768,)
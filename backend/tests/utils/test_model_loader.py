@@ -0,0 +1,111 @@
+"""
+Unit tests for ModelLoader configuration caching and client reuse.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+import utils.model_loader as model_loader_mod
+from utils.model_loader import ModelLoader
+
+
+@pytest.mark.unit
+class TestModelLoaderCaching:
+    """Test that .env and config.yaml are read once per process."""
+
+    def test_config_parsed_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        monkeypatch.setattr(model_loader_mod, "load_config", lambda: calls.append(1) or {"llm": {}})
+        model_loader_mod._cached_config.cache_clear()
+
+        first = ModelLoader()
+        second = ModelLoader()
+        model_loader_mod._cached_config.cache_clear()
+
+        assert len(calls) == 1
+        assert first.config is second.config
+
+    def test_dotenv_loaded_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        monkeypatch.setattr(model_loader_mod, "load_dotenv", lambda: calls.append(1))
+        monkeypatch.setattr(model_loader_mod, "_DOTENV_LOADED", False)
+
+        ModelLoader()
+        ModelLoader()
+
+        assert len(calls) == 1
+
+
+@pytest.mark.unit
+class TestModelLoaderSingleton:
+    """Test that one loader and one client per provider are shared."""
+
+    def test_singleton_instance(self, monkeypatch):
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+
+        assert ModelLoader() is ModelLoader()
+
+    def test_embeddings_client_reused(self, monkeypatch):
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        loader = ModelLoader()
+        monkeypatch.setattr(loader, "_embeddings", {})
+
+        first = loader.load_embeddings()
+        second = ModelLoader().load_embeddings()
+
+        assert first is second
+        assert first.task_type is None
+
+
+@pytest.mark.unit
+class TestEmbeddingsTimeout:
+    """Test that embedding requests give up after the configured timeout."""
+
+    def test_timeout_reaches_http_client(self, monkeypatch):
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        loader = ModelLoader()
+        monkeypatch.setattr(loader, "_embeddings", {})
+
+        embeddings = loader.load_embeddings()
+
+        http_options = embeddings.client._api_client._http_options
+        assert http_options.timeout == 60_000
+        assert "langchain-google-genai" in http_options.headers["user-agent"]
+
+    def test_vertex_client_left_alone(self):
+        client = object()
+        embeddings = SimpleNamespace(_use_vertexai=True, client=client)
+
+        assert model_loader_mod._with_request_timeout(embeddings, 60).client is client
+
+    def test_hung_server_times_out(self, monkeypatch):
+        import socket
+        import time
+        from functools import partial
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        from langchain_google_genai._common import GoogleGenerativeAIError
+
+        monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+        loader = ModelLoader()
+        monkeypatch.setattr(loader, "_embeddings", {})
+        monkeypatch.setitem(loader.config["embedding_model"], "request_timeout", 0.5)
+        # accepts connections but never answers
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        base_url = f"http://127.0.0.1:{server.getsockname()[1]}"
+        # the wrapper's base_url must survive the client rebuild for the request to reach the server
+        monkeypatch.setattr(
+            model_loader_mod, "GoogleGenerativeAIEmbeddings", partial(GoogleGenerativeAIEmbeddings, base_url=base_url)
+        )
+        embeddings = loader.load_embeddings()
+        assert embeddings.client._api_client._http_options.base_url.startswith(base_url)
+
+        start = time.monotonic()
+        with pytest.raises(GoogleGenerativeAIError, match="timed out"):
+            embeddings.embed_documents(["hello"])
+        server.close()
+
+        assert time.monotonic() - start < 5
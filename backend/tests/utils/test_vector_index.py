@@ -0,0 +1,171 @@
+"""
+Unit tests for FAISS index construction helpers.
+"""
+
+import numpy as np
+import pytest
+from utils.vector_index import (
+    build_hnsw_index,
+    build_index,
+    build_vectorstore,
+    load_vectorstore,
+    normalize_vectors,
+    reset_training_pool,
+    save_vectorstore,
+    update_training_pool,
+)
+
+
+def _mapped_lines(path):
+    with open("/proc/self/maps") as fh:
+        return [line for line in fh if str(path) in line]
+
+
+@pytest.mark.unit
+class TestHNSWVectorstore:
+    """Test building a LangChain FAISS store over an HNSW index."""
+
+    def test_build_and_search(self, mock_embeddings):
+        # arrange
+        rng = np.random.default_rng(0)
+        vectors = normalize_vectors(rng.random((50, 16), dtype=np.float32))
+        texts = [f"chunk {i}" for i in range(50)]
+        metadatas = [{"source_file": "guide.pdf", "i": i} for i in range(50)]
+
+        # act
+        store = build_vectorstore(mock_embeddings, build_hnsw_index(16), texts, vectors, metadatas)
+        docs = store.similarity_search_by_vector(vectors[7].tolist(), k=1)
+
+        # assert
+        assert store.index.ntotal == 50
+        assert store.index.hnsw.efSearch == 64
+        assert docs[0].page_content == "chunk 7"
+        assert docs[0].metadata["i"] == 7
+
+
+@pytest.mark.unit
+class TestIndexSelection:
+    """Test config-driven index type selection."""
+
+    def test_ivfpq_is_trained(self):
+        vectors = np.random.default_rng(0).random((1000, 32), dtype=np.float32)
+
+        index = build_index("ivfpq", vectors, nprobe=8)
+
+        assert index.is_trained
+        assert index.nprobe == 8
+        assert index.ntotal == 0
+
+    def test_ivfpq_falls_back_on_small_corpus(self):
+        vectors = np.random.default_rng(0).random((10, 32), dtype=np.float32)
+
+        index = build_index("ivfpq", vectors)
+
+        assert type(index).__name__ == "IndexFlatIP"
+
+    @pytest.mark.parametrize("index_type,expected", [
+        ("flat", "IndexScalarQuantizer"),
+        ("hnsw", "IndexHNSWSQ"),
+    ])
+    def test_fp16_encoding(self, mock_embeddings, index_type, expected):
+        vectors = normalize_vectors(np.random.default_rng(0).random((40, 16), dtype=np.float32))
+
+        index = build_index(index_type, vectors, encoding="fp16")
+        store = build_vectorstore(mock_embeddings, index, [f"c{i}" for i in range(40)], vectors, [{}] * 40)
+        docs = store.similarity_search_by_vector(vectors[5].tolist(), k=1)
+
+        assert type(index).__name__ == expected
+        assert docs[0].page_content == "c5"
+
+    def test_unknown_encoding_rejected(self):
+        with pytest.raises(ValueError):
+            build_index("flat", np.zeros((4, 8), dtype=np.float32), encoding="fp8")
+
+    def test_unknown_type_rejected(self):
+        with pytest.raises(ValueError):
+            build_index("annoy", np.zeros((4, 8), dtype=np.float32))
+
+
+@pytest.mark.unit
+class TestTrainingPool:
+    """Test the rolling on-disk training window for IVF retraining."""
+
+    def test_pool_appends_and_truncates(self, tmp_path):
+        pool_path = tmp_path / "training_pool.npy"
+        first = np.full((3, 4), 1.0, dtype=np.float32)
+        second = np.full((4, 4), 2.0, dtype=np.float32)
+
+        update_training_pool(pool_path, first, max_train_size=5)
+        pool = update_training_pool(pool_path, second, max_train_size=5)
+
+        assert pool.shape == (5, 4)
+        assert pool[0, 0] == 1.0
+        assert pool[-1, 0] == 2.0
+
+    def test_reset_removes_pool(self, tmp_path):
+        pool_path = tmp_path / "training_pool.npy"
+        update_training_pool(pool_path, np.zeros((2, 4), dtype=np.float32))
+
+        reset_training_pool(pool_path)
+        reset_training_pool(pool_path)
+
+        assert not pool_path.exists()
+
+
+@pytest.mark.unit
+class TestInnerProductSearch:
+    """Test cosine search via normalized vectors and inner-product indexes."""
+
+    def test_normalize_vectors(self):
+        vectors = normalize_vectors([[3.0, 4.0], [0.0, 2.0]])
+
+        assert vectors.dtype == np.float32
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+    def test_saved_store_normalizes_queries(self, tmp_path, mock_embeddings):
+        vectors = normalize_vectors(np.eye(4, dtype=np.float32) + 0.01)
+        store = build_vectorstore(
+            mock_embeddings, build_index("flat", vectors), [f"c{i}" for i in range(4)], vectors, [{}] * 4
+        )
+        store.save_local(str(tmp_path))
+
+        loaded = load_vectorstore(tmp_path, mock_embeddings)
+        # an unnormalized query should score as cosine similarity (<= 1)
+        docs_and_scores = loaded.similarity_search_with_score_by_vector([0.0, 0.0, 5.0, 0.0], k=1)
+
+        assert docs_and_scores[0][0].page_content == "c2"
+        assert docs_and_scores[0][1] == pytest.approx(1.0, abs=1e-3)
+
+    @pytest.mark.parametrize("index_type,encoding", [("flat", "fp32"), ("hnsw", "fp16"), ("ivfpq", "fp32")])
+    def test_mmap_load_maps_index_file(self, tmp_path, mock_embeddings, index_type, encoding):
+        vectors = normalize_vectors(np.random.default_rng(1).random((300, 8), dtype=np.float32))
+        store = build_vectorstore(
+            mock_embeddings, build_index(index_type, vectors, encoding=encoding),
+            [f"c{i}" for i in range(300)], vectors, [{}] * 300,
+        )
+        save_vectorstore(store, tmp_path)
+
+        loaded = load_vectorstore(tmp_path, mock_embeddings, mmap=True)
+        docs = loaded.similarity_search_by_vector(vectors[3].tolist(), k=1)
+
+        assert _mapped_lines(tmp_path / "index.faiss")
+        assert loaded.index.ntotal == 300
+        if index_type != "ivfpq":
+            assert docs[0].page_content == "c3"
+
+    def test_save_keeps_mapped_readers_valid(self, tmp_path, mock_embeddings):
+        vectors = normalize_vectors(np.random.default_rng(2).random((20, 8), dtype=np.float32))
+        texts = [f"c{i}" for i in range(20)]
+        save_vectorstore(build_vectorstore(mock_embeddings, build_index("flat", vectors), texts, vectors, [{}] * 20),
+                         tmp_path)
+        reader = load_vectorstore(tmp_path, mock_embeddings, mmap=True)
+
+        save_vectorstore(build_vectorstore(mock_embeddings, build_index("flat", vectors[:5]), texts[:5],
+                                           vectors[:5], [{}] * 5), tmp_path)
+        docs = reader.similarity_search_by_vector(vectors[12].tolist(), k=1)
+
+        # the reader still maps the replaced (now unlinked) file rather than the rewritten one
+        assert all(line.rstrip().endswith("(deleted)") for line in _mapped_lines(tmp_path / "index.faiss"))
+        assert docs[0].page_content == "c12"
+        assert load_vectorstore(tmp_path, mock_embeddings).index.ntotal == 5
+        assert sorted(p.name for p in tmp_path.parent.iterdir() if p.name.startswith(".saving-")) == []
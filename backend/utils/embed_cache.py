@@ -0,0 +1,61 @@
+# utils/embed_cache.py
+import hashlib
+import sqlite3
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+# Stay well below SQLite's bound-parameter limit for IN (...) lookups
+_LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """SQLite-backed store of embedding vectors keyed by sha256(model_name + text)."""
+
+    def __init__(self, db_path: str, model_name: str):
+        self.db_path = str(db_path)
+        self.model_name = model_name
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, dim INT, vec BLOB)"
+        )
+        self.conn.commit()
+        log.info("Embedding cache opened", path=self.db_path, model=model_name)
+
+    def key(self, text: str) -> str:
+        """Return the cache key for a chunk text under the current model."""
+        return hashlib.sha256((self.model_name + text).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Return cached vectors for the given keys; misses are simply absent."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        for i in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+            batch = keys[i:i + _LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT hash, dim, vec FROM embeddings WHERE hash IN ({placeholders})", batch
+            )
+            for h, dim, blob in rows:
+                vec = np.frombuffer(blob, dtype=np.float32)
+                if vec.shape[0] == dim:
+                    found[h] = vec
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """Insert or replace vectors for the given keys."""
+        rows = []
+        for h, vec in items.items():
+            arr = np.asarray(vec, dtype=np.float32)
+            rows.append((h, int(arr.shape[0]), arr.tobytes()))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, dim, vec) VALUES (?, ?, ?)", rows
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
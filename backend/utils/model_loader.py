@@ -1,6 +1,8 @@
 import os
 import sys
+from functools import lru_cache
 from dotenv import load_dotenv
+from google import genai
 from utils.config_loader import load_config
 from langchain_google_genai import GoogleGenerativeAI, ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain_groq import ChatGroq
@@ -10,12 +12,63 @@ from exception.custom_exception import DocumentPortalException
 
 log = CustomLogger().get_logger(__name__)
 
+_DOTENV_LOADED = False
+
+
+def _load_dotenv_once():
+    """Read .env on first use only; later ModelLoader() calls skip the disk read."""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        load_dotenv()
+        _DOTENV_LOADED = True
+
+
+@lru_cache(maxsize=1)
+def _cached_config():
+    """Parse config.yaml once per process and share the result."""
+    return load_config()
+
+
+def _with_request_timeout(embeddings, timeout: float):
+    """Rebuild the wrapper's genai client so embedding requests give up after timeout seconds.
+
+    langchain-google-genai never reads request_options and leaves HttpOptions.timeout unset
+    (wait forever). The new client copies the wrapper's HttpOptions (headers, base_url,
+    client_args) and only adds the timeout, in milliseconds.
+    """
+    if getattr(embeddings, "_use_vertexai", False) or not isinstance(embeddings.client, genai.Client):
+        log.warning("Embedding request timeout not applied", reason="not a Gemini API genai.Client")
+        return embeddings
+    http_options = embeddings.client._api_client._http_options.model_copy(
+        update = {"timeout": int(timeout * 1000)}
+    )
+    embeddings.client = genai.Client(
+        api_key = embeddings.google_api_key.get_secret_value(),
+        http_options = http_options,
+    )
+    return embeddings
+
+
 class ModelLoader:
-    """A Utility Class for Loading the Embedding Models and LLM Models"""
+    """A Utility Class for Loading the Embedding Models and LLM Models
+    
+    Process-wide singleton: every ModelLoader() returns the same instance, and the
+    embedding/LLM clients it builds are reused so their HTTP connection pools are shared.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            instance = super().__new__(cls)
+            instance._embeddings = {}
+            instance._llms = {}
+            cls._instance = instance
+        return cls._instance
+
     def __init__(self):
-        load_dotenv()
+        _load_dotenv_once()
         self._validate_env()
-        self.config = load_config()
+        self.config = _cached_config()
         log.info("Configuration loaded successfully", config_keys = list(self.config.keys()))
 
     def _validate_env(self):
@@ -54,7 +107,14 @@ class ModelLoader:
             if not self.api_keys.get("GOOGLE_API_KEY"):
                 raise ValueError("GOOGLE_API_KEY not found. Embeddings require Google Gemini API.")
             
-            return GoogleGenerativeAIEmbeddings(model = model_name)
+            if model_name not in self._embeddings:
+                # task_type is left unset on purpose: the client already sends RETRIEVAL_DOCUMENT
+                # for embed_documents and RETRIEVAL_QUERY for embed_query, and pinning it here
+                # would make query embeddings use the document task type
+                embeddings = GoogleGenerativeAIEmbeddings(model = model_name)
+                timeout = self.config["embedding_model"].get("request_timeout", 60)
+                self._embeddings[model_name] = _with_request_timeout(embeddings, timeout)
+            return self._embeddings[model_name]
         except Exception as e:
             log.error("Error loading embedding model", error = str(e))
             raise DocumentPortalException(f"Failed to load embedding model: {str(e)}")
@@ -84,6 +144,9 @@ class ModelLoader:
                 if provider_key not in llm_block:
                     continue
                 
+                if provider_key in self._llms:
+                    return self._llms[provider_key]
+                
                 llm_config = llm_block[provider_key]
                 provider = llm_config.get("provider")
                 model_name = llm_config.get("model_name")
@@ -99,6 +162,7 @@ class ModelLoader:
                         max_tokens=max_tokens
                     )
                     log.info("Loaded LLM successfully", class_name="ChatOpenAI")
+                    self._llms[provider_key] = llm
                     return llm
 
                 elif provider == "google":
@@ -108,6 +172,7 @@ class ModelLoader:
                         max_output_tokens=max_tokens
                     )
                     log.info("Loaded LLM successfully", class_name="ChatGoogleGenerativeAI")
+                    self._llms[provider_key] = llm
                     return llm
                 
                 elif provider == "groq":
@@ -116,6 +181,7 @@ class ModelLoader:
                         temperature=temperature
                     )
                     log.info("Loaded LLM successfully", class_name="ChatGroq")
+                    self._llms[provider_key] = llm
                     return llm
 
             except Exception as e:
@@ -0,0 +1,231 @@
+# utils/vector_index.py
+import math
+import os
+import shutil
+import tempfile
+import warnings
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+import faiss  # type: ignore
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore  # type: ignore
+from langchain_community.vectorstores import FAISS  # type: ignore
+from langchain_community.vectorstores.utils import DistanceStrategy  # type: ignore
+
+from logger.custom_logger import CustomLogger
+
+log = CustomLogger().get_logger(__name__)
+
+# HNSW graph parameters: M neighbours per node, build/query beam widths
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# IVF-PQ parameters: 8-bit codes, cells probed per query
+IVFPQ_NBITS = 8
+IVFPQ_NPROBE = 16
+# PQ needs at least 2**nbits training points per codebook
+IVFPQ_MIN_TRAIN = 2 ** IVFPQ_NBITS
+
+# Rolling window of recent vectors used to (re)train IVF centroids
+TRAINING_POOL_FILE = "training_pool.npy"
+MAX_TRAIN_SIZE = 50_000
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+# Per-dimension storage for flat/HNSW vectors: fp16 halves the index (2 B/dim), sq8 quarters it
+VECTOR_ENCODINGS = {
+    "fp32": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def normalize_vectors(vectors) -> np.ndarray:
+    """Return a contiguous float32 copy of vectors scaled to unit L2 norm (for cosine via inner product)."""
+    vectors = np.array(vectors, dtype=np.float32, order="C")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _ip_vectorstore_kwargs(index) -> dict:
+    """LangChain FAISS kwargs matching the index metric: inner-product indexes also normalize queries."""
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return {"distance_strategy": DistanceStrategy.MAX_INNER_PRODUCT, "normalize_L2": True}
+    return {}
+
+
+@contextmanager
+def _quiet_normalize_warning():
+    """LangChain warns whenever normalize_L2 is combined with inner product, which is exactly cosine here."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="Normalizing L2 is not applicable")
+        yield
+
+
+def _scalar_quantizer(encoding: str):
+    if encoding not in VECTOR_ENCODINGS:
+        raise ValueError(
+            f"Unknown vector_encoding '{encoding}'. Expected one of: {', '.join(VECTOR_ENCODINGS)}"
+        )
+    return VECTOR_ENCODINGS[encoding]
+
+
+def build_hnsw_index(dim: int, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                     ef_search: int = HNSW_EF_SEARCH, encoding: str = "fp32"):
+    """Create an empty HNSW index; efSearch is persisted with the index file.
+
+    Scalar-quantized encodings (fp16/sq8) must be trained before vectors are added.
+    """
+    qtype = _scalar_quantizer(encoding)
+    if qtype is None:
+        index = faiss.IndexHNSWFlat(dim, m, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexHNSWSQ(dim, qtype, m, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = ef_construction
+    index.hnsw.efSearch = ef_search
+    log.info("Created HNSW index", dim=dim, m=m, ef_construction=ef_construction, ef_search=ef_search,
+             encoding=encoding)
+    return index
+
+
+def _pq_subquantizers(dim: int, max_m: int = 64) -> int:
+    """Largest sub-quantizer count <= min(max_m, dim // 4) that divides dim."""
+    m = max(1, min(max_m, dim // 4))
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_ivfpq_index(vectors: np.ndarray, nprobe: int = IVFPQ_NPROBE, nbits: int = IVFPQ_NBITS):
+    """Create and train an IVF-PQ index on vectors; nprobe is persisted with the index file."""
+    n, dim = vectors.shape
+    nlist = max(1, int(4 * math.sqrt(n)))
+    m = _pq_subquantizers(dim)
+    quantizer = faiss.IndexFlatIP(dim)
+    index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, nbits, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.nprobe = nprobe
+    log.info("Trained IVF-PQ index", dim=dim, n=n, nlist=nlist, m=m, nbits=nbits, nprobe=nprobe)
+    return index
+
+
+def build_index(index_type: str, vectors: np.ndarray, nprobe: int = IVFPQ_NPROBE,
+                train_vectors: Optional[np.ndarray] = None, encoding: str = "fp32"):
+    """Return an empty, trained FAISS index of the configured type for vectors.
+
+    train_vectors defaults to vectors; pass a subset to bound IVF training cost.
+    encoding sets how flat/HNSW indexes store vectors (IVF-PQ is already compressed).
+    """
+    if train_vectors is not None:
+        vectors = train_vectors
+    n, dim = vectors.shape
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index_type '{index_type}'. Expected one of: {', '.join(INDEX_TYPES)}")
+
+    if index_type == "ivfpq":
+        if n >= IVFPQ_MIN_TRAIN:
+            return build_ivfpq_index(vectors, nprobe=nprobe)
+        log.warning("Too few vectors to train IVF-PQ, falling back to flat index", n=n)
+        index_type = "flat"
+
+    qtype = _scalar_quantizer(encoding)
+    if index_type == "hnsw":
+        index = build_hnsw_index(dim, encoding=encoding)
+    elif qtype is None:
+        index = faiss.IndexFlatIP(dim)
+    else:
+        index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+    if qtype is not None:
+        # fp16 needs no statistics, but sq8 learns per-dimension ranges from the data
+        index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def empty_index_like(index):
+    """Return an empty copy of a trained index, keeping its IVF centroids and PQ codebooks."""
+    clone = faiss.clone_index(index)
+    clone.reset()
+    return clone
+
+
+def update_training_pool(pool_path: Path, new_vectors: np.ndarray,
+                         max_train_size: int = MAX_TRAIN_SIZE) -> np.ndarray:
+    """Append new_vectors to the on-disk pool, keep the most recent max_train_size, return it memory-mapped."""
+    pool_path = Path(pool_path)
+    if pool_path.exists():
+        pool = np.load(pool_path, mmap_mode="r")
+        combined = np.concatenate([pool, new_vectors])[-max_train_size:]
+        del pool
+    else:
+        combined = np.asarray(new_vectors, dtype=np.float32)[-max_train_size:]
+
+    # Write beside the old pool and swap, so the mapped file is never truncated in place
+    tmp_path = pool_path.with_name(pool_path.name + ".tmp")
+    with open(tmp_path, "wb") as fh:
+        np.save(fh, np.ascontiguousarray(combined, dtype=np.float32))
+    os.replace(tmp_path, pool_path)
+    log.info("Training pool updated", path=str(pool_path), size=len(combined), max_size=max_train_size)
+    return np.load(pool_path, mmap_mode="r")
+
+
+def reset_training_pool(pool_path: Path) -> None:
+    """Drop the pool once its vectors have been used to train the index."""
+    Path(pool_path).unlink(missing_ok=True)
+
+
+def build_vectorstore(embeddings, index, texts: List[str], vectors: np.ndarray,
+                      metadatas: List[dict], ids: Optional[List[str]] = None) -> FAISS:
+    """Wrap a ready (empty, trained if required) FAISS index in a LangChain store and add vectors."""
+    with _quiet_normalize_warning():
+        vectorstore = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            **_ip_vectorstore_kwargs(index),
+        )
+    vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+    return vectorstore
+
+
+def save_vectorstore(vectorstore: FAISS, folder_path) -> None:
+    """Save a store so that processes with the old index memory-mapped keep working.
+
+    Files are written to a sibling temp directory and swapped in with os.replace; rewriting
+    a mapped index in place makes its readers crash with SIGBUS on their next search.
+    """
+    folder_path = Path(folder_path)
+    folder_path.mkdir(parents=True, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".saving-", dir=folder_path.parent)
+    try:
+        vectorstore.save_local(tmp_dir)
+        for name in sorted(os.listdir(tmp_dir)):
+            os.replace(os.path.join(tmp_dir, name), folder_path / name)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_vectorstore(folder_path, embeddings, mmap: bool = False) -> FAISS:
+    """Load a saved FAISS store, normalizing queries when the index uses inner product.
+
+    With mmap=True the index file is memory-mapped read-only: the kernel pages vectors in
+    on demand and shares them across forked workers. Use it for query-only stores.
+    """
+    # IO_FLAG_MMAP only maps IVF inverted lists; MMAP_IFC maps the whole file for every index type
+    io_flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    # allow_dangerous_deserialization=True: the pickle is one we wrote ourselves
+    vectorstore = FAISS.load_local(
+        str(folder_path), embeddings, allow_dangerous_deserialization=True, io_flags=io_flags
+    )
+    kwargs = _ip_vectorstore_kwargs(vectorstore.index)
+    if not kwargs:
+        return vectorstore
+    with _quiet_normalize_warning():
+        return FAISS(
+            embeddings,
+            vectorstore.index,
+            vectorstore.docstore,
+            vectorstore.index_to_docstore_id,
+            **kwargs,
+        )